@@ -1,9 +1,14 @@
 import os
+import re
+import asyncio
 import uuid
 import urllib.parse
 import time
+import hashlib
 from datetime import datetime
-from functools import wraps
+from decimal import Decimal, InvalidOperation
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps, lru_cache
 import bcrypt
 import jwt
 from sanic import Sanic, response
@@ -11,6 +16,7 @@ from sanic.exceptions import NotFound
 import asyncpg
 from jinja2 import Environment, FileSystemLoader, select_autoescape
 
+# Sanic installs the uvloop event loop policy automatically when uvloop is available (pinned in requirements.txt)
 app = Sanic("ERP_System")
 
 try:
@@ -21,7 +27,24 @@ except Exception:
 
 DATABASE_URL = os.environ.get("DATABASE_URL")
 JWT_SECRET = os.environ.get("JWT_SECRET", "super-secret-key-change-in-prod")
+# bcrypt work factor for newly hashed passwords; existing hashes keep the cost they were created with
+BCRYPT_COST = int(os.environ.get("BCRYPT_COST", 10))
 PORT = int(os.environ.get("PORT", 10000))
+# DEBUG=1 enables Sanic debug mode and per-request access logs in a single worker; never set it in production
+DEBUG = os.environ.get("DEBUG") == "1"
+# Each Sanic worker owns its own pool and in-memory caches: peak DB connections = WORKERS x DB_POOL_MAX_SIZE.
+# WORKERS=auto starts one worker per CPU core (what Sanic's fast=True does).
+WORKERS = (os.cpu_count() or 1) if os.environ.get("WORKERS") == "auto" else int(os.environ.get("WORKERS", 1))
+DB_POOL_MIN_SIZE = int(os.environ.get("DB_POOL_MIN_SIZE", 5))
+DB_POOL_MAX_SIZE = int(os.environ.get("DB_POOL_MAX_SIZE", 25))
+# Seconds to wait for a free pooled connection before failing the request instead of queueing forever
+DB_POOL_ACQUIRE_TIMEOUT = float(os.environ.get("DB_POOL_ACQUIRE_TIMEOUT", 10))
+# Seconds an idle pooled connection is kept before being closed (0 keeps them forever)
+DB_POOL_MAX_INACTIVE_LIFETIME = float(os.environ.get("DB_POOL_MAX_INACTIVE_LIFETIME", 300))
+# Per-statement timeout in seconds so a runaway query cannot pin a pooled connection (0 disables it)
+DB_COMMAND_TIMEOUT = float(os.environ.get("DB_COMMAND_TIMEOUT", 60))
+# asyncpg prepared-statement cache; keep at 0 behind transaction-mode poolers (PgBouncer) that reject named statements
+DB_STATEMENT_CACHE_SIZE = int(os.environ.get("DB_STATEMENT_CACHE_SIZE", 0))
 
 env = Environment(
     loader=FileSystemLoader('templates'),
@@ -31,21 +54,36 @@ env = Environment(
 # Enterprise Performance In-Memory Caches
 USER_AUTH_CACHE = {}
 CACHE_TTL = 60  # Check authorization freshness every 60 seconds
+NEGATIVE_CACHE_TTL = 300  # Re-check unknown tables and unresolved foreign keys every 5 minutes so new tables are picked up
 SCHEMA_CACHE = {
     "columns": {},
     "schema_maps": {},
     "pks": {},
     "fks": {},
     "display_cols": {},
+    "sequences": {},
+    "layouts": {},
+    "audit_cols": {},
+    "fk_targets": {},
+    "coercers": {},
+    "search_sql": {},
+    "missing_tables": {},
     "cols_map": None
 }
 
+@lru_cache(maxsize=4096)
 def quote_ident(name: str) -> str:
-    """Safely quotes SQL identifiers (table names, column names)."""
+    """Safely quotes SQL identifiers (table names, column names); memoised so each identifier is quoted once per process."""
     if not name:
         return '""'
     return '"' + str(name).replace('"', '""') + '"'
 
+@lru_cache(maxsize=4096)
+def make_human_readable(column_name: str) -> str:
+    """Builds a display label from a column name by dropping its table prefix (e.g. pcp_company_name -> Company Name)."""
+    prefix, sep, rest = column_name.partition('_')
+    return (rest if sep else prefix).replace('_', ' ').title()
+
 def safe_cast_pk(val, data_type='integer'):
     """Safely converts primary key values based on column target type."""
     if val is None or str(val) == "":
@@ -60,6 +98,16 @@ def safe_cast_pk(val, data_type='integer'):
             return None
     return str(val)
 
+async def run_blocking(func, *args):
+    """Runs a CPU-bound call (e.g. bcrypt) on the worker's thread pool so the event loop keeps serving requests."""
+    executor = getattr(app.ctx, 'executor', None)
+    return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+
+async def hash_password(plain: str) -> str:
+    """Hashes a plain-text password with bcrypt off the event loop."""
+    hashed = await run_blocking(bcrypt.hashpw, plain.encode('utf-8'), bcrypt.gensalt(rounds=BCRYPT_COST))
+    return hashed.decode('utf-8')
+
 def prune_user_auth_cache():
     """Prunes expired entries and caps USER_AUTH_CACHE size."""
     now = time.time()
@@ -71,6 +119,10 @@ def prune_user_auth_cache():
         for k in keys:
             USER_AUTH_CACHE.pop(k, None)
 
+def clear_auth_cache():
+    """Flushes per-user authorization caches after data mutations (screens, modules, roles)."""
+    USER_AUTH_CACHE.clear()
+
 def clear_schema_cache():
     """Flushes schema and auth caches when schema mutations occur."""
     SCHEMA_CACHE["columns"].clear()
@@ -78,24 +130,75 @@ def clear_schema_cache():
     SCHEMA_CACHE["pks"].clear()
     SCHEMA_CACHE["fks"].clear()
     SCHEMA_CACHE["display_cols"].clear()
+    SCHEMA_CACHE["sequences"].clear()
+    SCHEMA_CACHE["layouts"].clear()
+    SCHEMA_CACHE["audit_cols"].clear()
+    SCHEMA_CACHE["fk_targets"].clear()
+    SCHEMA_CACHE["coercers"].clear()
+    SCHEMA_CACHE["search_sql"].clear()
+    SCHEMA_CACHE["missing_tables"].clear()
     SCHEMA_CACHE["cols_map"] = None
-    USER_AUTH_CACHE.clear()
+    clear_auth_cache()
+
+# Column metadata with a primary key flag; the filters narrow both the columns and the PK lookup to one table
+COLUMNS_WITH_PK_SQL = """
+    SELECT c.table_name, c.column_name, c.data_type, c.is_nullable, c.character_maximum_length,
+           (pk.column_name IS NOT NULL) AS is_pk
+    FROM information_schema.columns c
+    LEFT JOIN (
+        SELECT kcu.table_name, kcu.column_name
+        FROM information_schema.table_constraints tc
+        JOIN information_schema.key_column_usage kcu
+          ON kcu.constraint_name = tc.constraint_name
+         AND kcu.table_schema = tc.table_schema
+         AND kcu.table_name = tc.table_name
+        WHERE tc.constraint_type = 'PRIMARY KEY' AND tc.table_schema = 'public'{pk_filter}
+    ) pk ON pk.table_name = c.table_name AND pk.column_name = c.column_name
+    WHERE c.table_schema = 'public'{col_filter}
+    ORDER BY c.table_name, c.ordinal_position
+"""
+TABLE_COLUMNS_QUERY = COLUMNS_WITH_PK_SQL.format(pk_filter=" AND tc.table_name = $1", col_filter=" AND c.table_name = $1")
+ALL_COLUMNS_QUERY = COLUMNS_WITH_PK_SQL.format(pk_filter="", col_filter="")
 
 async def get_table_columns(conn, table_name: str):
-    """Fetches and caches table column metadata to avoid repeated information_schema queries."""
+    """Fetches and caches table column metadata (including the primary key flag) in a single catalog round-trip."""
     if table_name in SCHEMA_CACHE["columns"]:
         return SCHEMA_CACHE["columns"][table_name]
-    query = """
-        SELECT column_name, data_type, is_nullable, character_maximum_length 
-        FROM information_schema.columns 
-        WHERE table_name = $1 AND table_schema = 'public'
-        ORDER BY ordinal_position
-    """
-    rows = await conn.fetch(query, table_name)
+    if time.time() < SCHEMA_CACHE["missing_tables"].get(table_name, 0):
+        return []
+    rows = await conn.fetch(TABLE_COLUMNS_QUERY, table_name)
     cols = [dict(r) for r in rows]
+    for c in cols:
+        del c['table_name']
+    if not cols:
+        # Unknown tables are re-checked after NEGATIVE_CACHE_TTL so they resolve once created
+        SCHEMA_CACHE["missing_tables"][table_name] = time.time() + NEGATIVE_CACHE_TTL
+        return cols
+    _store_table_columns(table_name, cols)
+    return cols
+
+def _store_table_columns(table_name, cols):
+    # Display labels are derived once here so grids, forms and exports just read c['label']
+    for c in cols:
+        c['label'] = make_human_readable(c['column_name'])
     SCHEMA_CACHE["columns"][table_name] = cols
     SCHEMA_CACHE["schema_maps"][table_name] = {c['column_name']: c for c in cols}
-    return cols
+    pk = next((c['column_name'] for c in cols if c['is_pk']), None)
+    if pk:
+        SCHEMA_CACHE["pks"][table_name] = pk
+
+async def warm_schema_cache(conn):
+    """Preloads column, primary key and nav search metadata for every public table in one bulk catalog query."""
+    tables = {}
+    for r in await conn.fetch(ALL_COLUMNS_QUERY):
+        col = dict(r)
+        tables.setdefault(col.pop('table_name'), []).append(col)
+    for table_name, cols in tables.items():
+        _store_table_columns(table_name, cols)
+    SCHEMA_CACHE["cols_map"] = {
+        t: [c['column_name'].lower().replace('_', ' ') for c in cols]
+        for t, cols in tables.items()
+    }
 
 MODULE_ICON_MAP = {
     'general': 'layers',
@@ -178,11 +281,10 @@ async def build_modules_tree(conn, all_tables, table_modules):
             """
             col_rows = await conn.fetch(cols_query, table_codes)
             cols_map = {}
-            for r in col_rows:
-                t = r['table_name']
+            for t, col in col_rows:
                 if t not in cols_map:
                     cols_map[t] = []
-                cols_map[t].append(r['column_name'].lower().replace('_', ' '))
+                cols_map[t].append(col.lower().replace('_', ' '))
             SCHEMA_CACHE["cols_map"] = cols_map
         except Exception:
             cols_map = {}
@@ -291,54 +393,76 @@ async def get_authorized_tables(conn, user_id, role):
             """
             rows = await conn.fetch(query, user_id)
 
-    for r in rows:
-        code = r['psn_screen_code'].lower()
-        if role != 'ADM' and r['module_name'].lower() == 'erpadmin':
+    # Every query above selects (screen code, screen name, module name) in this order
+    for screen_code, screen_name, module_name in rows:
+        code = screen_code.lower()
+        if role != 'ADM' and module_name.lower() == 'erpadmin':
             continue
-        auth_tables[code] = r['psn_screen_name']
-        table_modules[code] = r['module_name']
+        auth_tables[code] = screen_name
+        table_modules[code] = module_name
 
     return auth_tables, table_modules
 
 @app.before_server_start
 async def setup_db(app, loop):
-    """Initializes the optimized asyncpg connection pool without statement caching for full DDL/schema resilience."""
+    """Initializes the optimized asyncpg connection pool; statement caching is opt-in via DB_STATEMENT_CACHE_SIZE."""
+    # bcrypt releases the GIL, so one thread per core lets concurrent logins hash in parallel
+    app.ctx.executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="bcrypt")
     if DATABASE_URL:
         app.ctx.pool = await asyncpg.create_pool(
             dsn=DATABASE_URL,
-            min_size=5,
-            max_size=25,
-            max_inactive_connection_lifetime=300.0,
-            statement_cache_size=0,
+            min_size=DB_POOL_MIN_SIZE,
+            max_size=DB_POOL_MAX_SIZE,
+            max_inactive_connection_lifetime=DB_POOL_MAX_INACTIVE_LIFETIME,
+            command_timeout=DB_COMMAND_TIMEOUT or None,
+            statement_cache_size=DB_STATEMENT_CACHE_SIZE,
             max_cached_statement_lifetime=0
         )
         try:
-            async with app.ctx.pool.acquire() as conn:
-                # 1. Ensure phc_module_t exists
-                await conn.execute("""
-                    CREATE TABLE IF NOT EXISTS phc_module_t (
-                        pmd_module_id SERIAL PRIMARY KEY,
-                        pmd_module_name VARCHAR(100) UNIQUE,
-                        pmd_module_icon VARCHAR(50),
-                        pmd_status VARCHAR(10) DEFAULT 'ACT',
-                        pmd_created_by VARCHAR(50) DEFAULT 'System',
-                        pmd_modified_by VARCHAR(50) DEFAULT 'System',
-                        pmd_created TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        pmd_modified TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    );
-                """)
-                # 2. Ensure pmd_module_icon column exists
-                await conn.execute("ALTER TABLE phc_module_t ADD COLUMN IF NOT EXISTS pmd_module_icon VARCHAR(50);")
-
-                # 3. Ensure phc_module_t screen exists in phc_screens_t
-                has_mod_screen = await conn.fetchval("SELECT psn_screen_id FROM phc_screens_t WHERE psn_screen_code = 'phc_module_t'")
-                if not has_mod_screen:
-                    max_id = await conn.fetchval("SELECT MAX(psn_screen_id) FROM phc_screens_t")
-                    erp_mod_id = await conn.fetchval("SELECT pmd_module_id FROM phc_module_t WHERE pmd_module_name = 'ERPAdmin'")
+            async with app.ctx.pool.acquire(timeout=DB_POOL_ACQUIRE_TIMEOUT) as conn:
+                try:
+                    # 1. Ensure phc_module_t exists
                     await conn.execute("""
-                        INSERT INTO phc_screens_t (psn_screen_id, psn_company_id, psn_module_id, psn_screen_code, psn_screen_name, psn_status, psn_created_by, psn_modified_by)
-                        VALUES ($1, 1001, $2, 'phc_module_t', 'Module Management', 'ACT', 'System', 'System')
-                    """, (max_id or 0) + 1, erp_mod_id)
+                        CREATE TABLE IF NOT EXISTS phc_module_t (
+                            pmd_module_id SERIAL PRIMARY KEY,
+                            pmd_module_name VARCHAR(100) UNIQUE,
+                            pmd_module_icon VARCHAR(50),
+                            pmd_status VARCHAR(10) DEFAULT 'ACT',
+                            pmd_created_by VARCHAR(50) DEFAULT 'System',
+                            pmd_modified_by VARCHAR(50) DEFAULT 'System',
+                            pmd_created TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                            pmd_modified TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                        );
+                    """)
+                    # 2. Ensure pmd_module_icon column exists
+                    await conn.execute("ALTER TABLE phc_module_t ADD COLUMN IF NOT EXISTS pmd_module_icon VARCHAR(50);")
+                except Exception as e:
+                    print("DB init safeguard non-fatal notice:", e)
+
+                try:
+                    await attach_pk_sequences(conn)
+                except Exception as e:
+                    print("Primary key sequence setup skipped:", e)
+
+                try:
+                    # 3. Ensure phc_module_t screen exists in phc_screens_t: one atomic conditional INSERT.
+                    # A sequence-backed key is left to the column default; otherwise MAX + 1 in the same statement.
+                    if await has_pk_sequence(conn, 'phc_screens_t', 'psn_screen_id'):
+                        key_col, key_val = "", ""
+                    else:
+                        key_col, key_val = "psn_screen_id, ", "(SELECT COALESCE(MAX(psn_screen_id), 0) + 1 FROM phc_screens_t), "
+                    await conn.execute(f"""
+                        INSERT INTO phc_screens_t ({key_col}psn_company_id, psn_module_id, psn_screen_code, psn_screen_name, psn_status, psn_created_by, psn_modified_by)
+                        SELECT {key_val}1001, (SELECT pmd_module_id FROM phc_module_t WHERE pmd_module_name = 'ERPAdmin'), 'phc_module_t', 'Module Management', 'ACT', 'System', 'System'
+                        WHERE NOT EXISTS (SELECT 1 FROM phc_screens_t WHERE psn_screen_code = 'phc_module_t')
+                    """)
+                except Exception as e:
+                    print("DB init safeguard non-fatal notice:", e)
+
+                try:
+                    await warm_schema_cache(conn)
+                except Exception as e:
+                    print("Schema cache warm-up skipped:", e)
         except Exception as e:
             print("DB init safeguard non-fatal notice:", e)
     else:
@@ -346,9 +470,11 @@ async def setup_db(app, loop):
 
 @app.after_server_stop
 async def close_db(app, loop):
-    """Gracefully closes all pooled connections on server shutdown."""
+    """Gracefully closes all pooled connections and the hashing thread pool on server shutdown."""
     if hasattr(app.ctx, 'pool') and app.ctx.pool:
         await app.ctx.pool.close()
+    if getattr(app.ctx, 'executor', None):
+        app.ctx.executor.shutdown(wait=False)
 
 def add_security_headers(res):
     res.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, max-age=0"
@@ -413,7 +539,7 @@ def check_auth(f):
             request.ctx.modules_tree = cached.get("modules_tree", {})
         else:
             try:
-                async with app.ctx.pool.acquire() as conn:
+                async with app.ctx.pool.acquire(timeout=DB_POOL_ACQUIRE_TIMEOUT) as conn:
                     user = await conn.fetchrow("SELECT pus_session_id, pus_user_type, pus_status FROM phc_users_t WHERE pus_user_id = $1", user_id)
                     if not user or user["pus_session_id"] != session_id:
                         return unauth_response(request)
@@ -445,10 +571,34 @@ def check_auth(f):
         return await f(request, *args, **kwargs)
     return decorated_function
 
+def require_authorized_table(request, table_name):
+    """Returns the screen title for an authorized table, or raises NotFound."""
+    # Authorized tables are resolved (and cached) per user by check_auth; reject before taking a pool slot
+    if table_name not in request.ctx.all_tables:
+        raise NotFound("Table not found or unauthorized")
+    return request.ctx.all_tables[table_name]
+
+@lru_cache(maxsize=1)
+def render_login_page():
+    """Renders the static login page once and derives its ETag from the content."""
+    html = env.get_template('login.html').render()
+    return html, '"' + hashlib.sha1(html.encode('utf-8')).hexdigest() + '"'
+
+LOGIN_USER_QUERIES = {
+    user_col: f"SELECT * FROM phc_users_t WHERE LOWER({user_col}) = LOWER($1)"
+    for user_col in ('pus_user_name', 'pus_usr_name')
+}
+
 @app.route('/login', methods=['GET', 'POST'])
 async def login(request):
     if request.method == 'GET':
-        return render_template('login.html', request=request)
+        # The login page carries no user data, so browsers may keep it and revalidate with If-None-Match
+        html, etag = render_login_page()
+        res = response.empty(status=304) if request.headers.get("If-None-Match") == etag else response.html(html)
+        res = add_security_headers(res)
+        res.headers["Cache-Control"] = "no-cache"
+        res.headers["ETag"] = etag
+        return res
     
     data = request.json or {}
     username = str(data.get("username", "")).strip()
@@ -457,21 +607,25 @@ async def login(request):
     if not username or not password:
         return add_security_headers(response.json({"status": "error", "message": "Invalid credentials"}, status=401))
 
-    async with app.ctx.pool.acquire() as conn:
-        try:
-            user = await conn.fetchrow("SELECT * FROM phc_users_t WHERE LOWER(pus_user_name) = LOWER($1)", username)
-        except Exception:
-            user = await conn.fetchrow("SELECT * FROM phc_users_t WHERE LOWER(pus_usr_name) = LOWER($1)", username)
+    async with app.ctx.pool.acquire(timeout=DB_POOL_ACQUIRE_TIMEOUT) as conn:
+        # The username column name differs between schemas; read it from the cached schema instead of probing with a failing query
+        await get_table_columns(conn, 'phc_users_t')
+        users_map = SCHEMA_CACHE["schema_maps"].get('phc_users_t', {})
+        user_col = 'pus_usr_name' if 'pus_usr_name' in users_map and 'pus_user_name' not in users_map else 'pus_user_name'
+        user = await conn.fetchrow(LOGIN_USER_QUERIES[user_col], username)
         
         if user:
             if user.get('pus_status') and user['pus_status'] == 'INA':
                 return add_security_headers(response.json({"status": "error", "message": "Account is inactive. Please contact your administrator."}, status=403))
 
-            stored_pwd = user.get('pus_pwd') or ""
+            # A bytea pus_pwd arrives as bytes and is passed to bcrypt as-is; text hashes are encoded once
+            stored_pwd = user.get('pus_pwd') or b""
+            if isinstance(stored_pwd, str):
+                stored_pwd = stored_pwd.encode('utf-8')
             is_valid = False
             if stored_pwd:
                 try:
-                    if bcrypt.checkpw(password.encode('utf-8'), stored_pwd.encode('utf-8')):
+                    if await run_blocking(bcrypt.checkpw, password.encode('utf-8'), stored_pwd):
                         is_valid = True
                 except (ValueError, TypeError):
                     pass
@@ -481,8 +635,8 @@ async def login(request):
                 user_id_val = user.get('pus_user_id') or user.get('id')
                 user_name_val = user.get('pus_user_name') or user.get('pus_usr_name') or username
 
-                async with conn.transaction():
-                    await conn.execute("UPDATE phc_users_t SET pus_session_id = $1 WHERE pus_user_id = $2", session_id, user_id_val)
+                # Single statement: autocommits without separate BEGIN/COMMIT round-trips
+                await conn.execute("UPDATE phc_users_t SET pus_session_id = $1 WHERE pus_user_id = $2", session_id, user_id_val)
                 
                 token_payload = {
                     "user_id": user_id_val,
@@ -507,9 +661,8 @@ async def logout(request):
         USER_AUTH_CACHE.pop(user_id, None)
         if hasattr(app.ctx, 'pool') and app.ctx.pool:
             try:
-                async with app.ctx.pool.acquire() as conn:
-                    async with conn.transaction():
-                        await conn.execute("UPDATE phc_users_t SET pus_session_id = NULL WHERE pus_user_id = $1", user_id)
+                async with app.ctx.pool.acquire(timeout=DB_POOL_ACQUIRE_TIMEOUT) as conn:
+                    await conn.execute("UPDATE phc_users_t SET pus_session_id = NULL WHERE pus_user_id = $1", user_id)
             except Exception as e:
                 print(f"Logout session clear error: {e}")
     res = response.redirect("/login")
@@ -519,40 +672,84 @@ async def logout(request):
 async def get_pk_column(conn, table_name):
     if table_name in SCHEMA_CACHE["pks"]:
         return SCHEMA_CACHE["pks"][table_name]
-    query = """
-        SELECT a.attname
-        FROM   pg_index i
-        JOIN   pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
-        WHERE  i.indrelid = $1::regclass AND i.indisprimary;
-    """
     try:
-        pk = await conn.fetchval(query, table_name)
-        if pk:
-            SCHEMA_CACHE["pks"][table_name] = pk
-            return pk
+        # Column metadata carries the formal primary key flag and primes the pk cache
+        col_names = [c['column_name'] for c in await get_table_columns(conn, table_name)]
     except Exception:
-        pass
+        return None
+    if table_name in SCHEMA_CACHE["pks"]:
+        return SCHEMA_CACHE["pks"][table_name]
 
     # Heuristic fallback if table lacks formal primary key constraint
-    try:
-        cols = await conn.fetch("""
-            SELECT column_name 
-            FROM information_schema.columns 
-            WHERE table_name = $1 AND table_schema = 'public'
-            ORDER BY ordinal_position
-        """, table_name)
-        col_names = [c['column_name'] for c in cols]
-        for c in col_names:
-            if c.endswith('_id') or c.endswith('_code') or c == 'id':
-                SCHEMA_CACHE["pks"][table_name] = c
-                return c
-        if col_names:
-            SCHEMA_CACHE["pks"][table_name] = col_names[0]
-            return col_names[0]
-    except Exception:
-        pass
+    for c in col_names:
+        if c.endswith('_id') or c.endswith('_code') or c == 'id':
+            SCHEMA_CACHE["pks"][table_name] = c
+            return c
+    if col_names:
+        SCHEMA_CACHE["pks"][table_name] = col_names[0]
+        return col_names[0]
     return None
 
+async def attach_pk_sequences(conn):
+    """Backs every single-column integer phc_* primary key that has no default with an owned sequence (startup only).
+
+    Runs under an advisory lock so workers booting together do not race on the DDL. Tables whose
+    sequence cannot be attached (e.g. insufficient privileges) keep the MAX + 1 insert fallback.
+    """
+    async with conn.transaction():
+        await conn.execute("SELECT pg_advisory_xact_lock(hashtext('attach_pk_sequences'))")
+        rows = await conn.fetch("""
+            SELECT c.table_name, c.column_name
+            FROM (
+                SELECT kcu.table_name, MIN(kcu.column_name) AS column_name
+                FROM information_schema.table_constraints tc
+                JOIN information_schema.key_column_usage kcu
+                  ON kcu.constraint_name = tc.constraint_name
+                 AND kcu.table_schema = tc.table_schema
+                 AND kcu.table_name = tc.table_name
+                WHERE tc.constraint_type = 'PRIMARY KEY' AND tc.table_schema = 'public'
+                  AND tc.table_name LIKE 'phc\\_%'
+                GROUP BY kcu.table_name, tc.constraint_name
+                HAVING COUNT(*) = 1
+            ) pk
+            JOIN information_schema.columns c
+              ON c.table_schema = 'public' AND c.table_name = pk.table_name AND c.column_name = pk.column_name
+            WHERE c.data_type IN ('integer', 'bigint', 'smallint')
+              AND c.is_identity = 'NO' AND c.column_default IS NULL
+        """)
+        for table_name, pk_column in rows:
+            q_table = quote_ident(table_name)
+            q_pk = quote_ident(pk_column)
+            q_seq = quote_ident(f"{table_name}_{pk_column}_seq")
+            seq_literal = "'" + q_seq.replace("'", "''") + "'"
+            try:
+                async with conn.transaction():
+                    await conn.execute(f"CREATE SEQUENCE IF NOT EXISTS {q_seq} OWNED BY {q_table}.{q_pk}")
+                    await conn.execute(f"SELECT setval({seq_literal}::regclass, COALESCE((SELECT MAX({q_pk}) FROM {q_table}), 0) + 1, false)")
+                    await conn.execute(f"ALTER TABLE {q_table} ALTER COLUMN {q_pk} SET DEFAULT nextval({seq_literal}::regclass)")
+            except Exception as e:
+                print(f"Primary key sequence setup skipped for {table_name}: {e}")
+
+async def has_pk_sequence(conn, table_name, pk_column):
+    """Reports (and caches) whether an integer primary key is generated by a nextval() default or an identity.
+
+    Read-only: sequences are attached at startup by attach_pk_sequences, never inside a request.
+    Constant defaults do not count, since every insert would receive the same key.
+    """
+    if table_name in SCHEMA_CACHE["sequences"]:
+        return SCHEMA_CACHE["sequences"][table_name]
+    try:
+        generated = await conn.fetchval("""
+            SELECT column_default LIKE 'nextval(%' OR is_identity = 'YES'
+            FROM information_schema.columns
+            WHERE table_schema = 'public' AND table_name = $1 AND column_name = $2
+        """, table_name, pk_column)
+    except Exception as e:
+        print(f"Primary key sequence check failed for {table_name}: {e}")
+        return False
+    SCHEMA_CACHE["sequences"][table_name] = bool(generated)
+    return bool(generated)
+
 # --- SMART FOREIGN KEY RESOLUTION ---
 FK_HEURISTICS = {
     'company_id': 'phc_companies_t',
@@ -594,29 +791,39 @@ async def get_fk_map(conn, table_name):
     except Exception: return {}
 
 async def resolve_fk_details(conn, table_name, column_name):
+    """Resolves a column to its (target table, target pk), caching hits until schema refresh and misses for NEGATIVE_CACHE_TTL."""
+    key = (table_name, column_name)
+    cached = SCHEMA_CACHE["fk_targets"].get(key)
+    if cached and time.time() < cached[2]:
+        return cached[0], cached[1]
+
+    f_table, f_pk = None, None
     fk_map = await get_fk_map(conn, table_name)
-    if column_name in fk_map: return fk_map[column_name]['table'], fk_map[column_name]['pk']
-    for suffix, target_table in FK_HEURISTICS.items():
-        if column_name.endswith(suffix):
-            target_pk = await get_pk_column(conn, target_table)
-            if target_pk: return target_table, target_pk
-    return None, None
+    if column_name in fk_map:
+        f_table, f_pk = fk_map[column_name]['table'], fk_map[column_name]['pk']
+    else:
+        for suffix, target_table in FK_HEURISTICS.items():
+            if column_name.endswith(suffix):
+                target_pk = await get_pk_column(conn, target_table)
+                if target_pk:
+                    f_table, f_pk = target_table, target_pk
+                    break
+
+    expires = float('inf') if f_table else time.time() + NEGATIVE_CACHE_TTL
+    SCHEMA_CACHE["fk_targets"][key] = (f_table, f_pk, expires)
+    return f_table, f_pk
+
+_DISPLAY_COL_RE = re.compile(r'(?:^|_)name$')
+_STATUS_COL_RE = re.compile(r'(?:^|_)status$')
+_PASSWORD_COL_RE = re.compile(r'password|pwd$')
 
 async def get_fk_display_dict(conn, f_table, f_pk, specific_ids=None):
     if "display_cols" not in SCHEMA_CACHE: SCHEMA_CACHE["display_cols"] = {}
     if f_table not in SCHEMA_CACHE["display_cols"]:
         cols = await conn.fetch("SELECT column_name FROM information_schema.columns WHERE table_name = $1", f_table)
-        col_names = [c['column_name'] for c in cols]
-        display_col = f_pk
-        for c in col_names:
-            if c.endswith('_name') or c == 'name':
-                display_col = c
-                break
-        status_col = None
-        for c in col_names:
-            if c.endswith('_status') or c == 'status':
-                status_col = c
-                break
+        col_names = [name for (name,) in cols]
+        display_col = next((c for c in col_names if _DISPLAY_COL_RE.search(c)), f_pk)
+        status_col = next((c for c in col_names if _STATUS_COL_RE.search(c)), None)
         SCHEMA_CACHE["display_cols"][f_table] = {"display": display_col, "status": status_col}
         
     info = SCHEMA_CACHE["display_cols"][f_table]
@@ -631,13 +838,14 @@ async def get_fk_display_dict(conn, f_table, f_pk, specific_ids=None):
         if not specific_ids: return {}
         q = f"SELECT {q_pk} as id, {q_display} as name FROM {q_table} WHERE {q_pk} = ANY($1)"
         rows = await conn.fetch(q, list(specific_ids))
-        return {r['id']: r['name'] for r in rows}
+        return {rid: name for rid, name in rows}
     else:
         q = f"SELECT {q_pk} as id, {q_display} as name FROM {q_table}"
         if status_col: q += f" WHERE {quote_ident(status_col)} = 'ACT'"
         rows = await conn.fetch(q)
-        return [{"id": str(r['id']), "name": f"{r['name']} (ID: {r['id']})"} for r in rows]
+        return [{"id": str(rid), "name": f"{name} (ID: {rid})"} for rid, name in rows]
 
+@lru_cache(maxsize=4096)
 def resolve_lookup_type(column_name: str) -> str:
     """Resolves a physical column name to its canonical lookup type code.
     
@@ -653,62 +861,67 @@ def resolve_lookup_type(column_name: str) -> str:
         return "GEN_STATUS"
         
     # 2. Strip standard 2-4 letter table prefixes if present (e.g., pbl_, prm_, plc_, psl_, ppm_)
-    parts = col_clean.split('_')
-    if len(parts) > 1 and len(parts[0]) <= 4:
-        return '_'.join(parts[1:]).upper()
-        
+    prefix, sep, rest = col_clean.partition('_')
+    if sep and len(prefix) <= 4:
+        return rest.upper()
+
     return col_clean.upper()
 
-async def get_dropdown_options(conn, table_name, column_name):
+ACTIVE_LOOKUPS_QUERY = """
+    SELECT upper({type_col}) as type_code, plv_lookup_value_code as id, plv_lookup_value_name as name
+    FROM phc_lookup_values_t
+    WHERE plv_status = 'ACT'
+      AND CURRENT_DATE BETWEEN COALESCE(plv_start_date, CURRENT_DATE) AND COALESCE(plv_end_date, CURRENT_DATE + interval '1 day')
+    ORDER BY plv_lookup_value_name
+"""
+
+# Pre-rendered once so every request sends byte-identical SQL (and hits asyncpg's statement cache when enabled)
+ACTIVE_LOOKUPS_QUERIES = {
+    type_col: ACTIVE_LOOKUPS_QUERY.format(type_col=type_col)
+    for type_col in ('plv_lookup_code', 'plv_lookup_type_code')
+}
+
+async def fetch_active_lookups(conn):
+    """Fetches all active lookup values in a single query, grouped by upper-cased lookup type code.
+
+    The lookup type column (plv_lookup_code or plv_lookup_type_code) is picked from the cached schema,
+    so schemas using the latter no longer pay for a failed query on every call.
+    """
+    if not await get_table_columns(conn, 'phc_lookup_values_t'):
+        return {}
+    schema_map = SCHEMA_CACHE["schema_maps"]['phc_lookup_values_t']
+    type_col = 'plv_lookup_code' if 'plv_lookup_code' in schema_map else 'plv_lookup_type_code'
+    try:
+        rows = await conn.fetch(ACTIVE_LOOKUPS_QUERIES[type_col])
+    except Exception as e:
+        print(f"Lookup values fetch failed: {e}")
+        return {}
+    lookups = {}
+    for r in rows:
+        lookups.setdefault(r[0], []).append(r)
+    return lookups
+
+async def get_dropdown_options(conn, table_name, column_name, lookups=None):
     if column_name.endswith('_org_id') or column_name == 'pos_org_id':
         return []
-        
-    # 1. Dynamic Canonical Lookup System Check
+
+    # 1. Dynamic Canonical Lookup System Check (resolved canonical code OR direct column name)
+    if lookups is None:
+        lookups = await fetch_active_lookups(conn)
     lookup_code = resolve_lookup_type(column_name)
     raw_upper = column_name.upper()
-    try:
-        # Check by resolved canonical code OR direct column name
-        query = """
-            SELECT plv_lookup_value_code as id, plv_lookup_value_name as name 
-            FROM phc_lookup_values_t 
-            WHERE (UPPER(plv_lookup_code) = UPPER($1) OR UPPER(plv_lookup_code) = UPPER($2))
-              AND plv_status = 'ACT'
-              AND CURRENT_DATE BETWEEN COALESCE(plv_start_date, CURRENT_DATE) AND COALESCE(plv_end_date, CURRENT_DATE + interval '1 day')
-            ORDER BY plv_lookup_value_name
-        """
-        rows = await conn.fetch(query, lookup_code, raw_upper)
-        if rows:
-            seen = set()
-            deduped = []
-            for r in rows:
-                key = str(r['name']).strip().lower()
-                if key not in seen:
-                    seen.add(key)
-                    deduped.append({"id": str(r['id']), "name": str(r['name'])})
-            return deduped
-    except Exception:
-        # Resilient fallback if schema uses plv_lookup_type_code
-        try:
-            query_fallback = """
-                SELECT plv_lookup_value_code as id, plv_lookup_value_name as name 
-                FROM phc_lookup_values_t 
-                WHERE (UPPER(plv_lookup_type_code) = UPPER($1) OR UPPER(plv_lookup_type_code) = UPPER($2))
-                  AND plv_status = 'ACT'
-                  AND CURRENT_DATE BETWEEN COALESCE(plv_start_date, CURRENT_DATE) AND COALESCE(plv_end_date, CURRENT_DATE + interval '1 day')
-                ORDER BY plv_lookup_value_name
-            """
-            rows = await conn.fetch(query_fallback, lookup_code, raw_upper)
-            if rows:
-                seen = set()
-                deduped = []
-                for r in rows:
-                    key = str(r['name']).strip().lower()
-                    if key not in seen:
-                        seen.add(key)
-                        deduped.append({"id": str(r['id']), "name": str(r['name'])})
-                return deduped
-        except Exception:
-            pass
+    rows = lookups.get(lookup_code, [])
+    if raw_upper != lookup_code and raw_upper in lookups:
+        rows = sorted(rows + lookups[raw_upper], key=lambda r: str(r['name']))
+    if rows:
+        seen = set()
+        deduped = []
+        for r in rows:
+            key = str(r['name']).strip().lower()
+            if key not in seen:
+                seen.add(key)
+                deduped.append({"id": str(r['id']), "name": str(r['name'])})
+        return deduped
 
     # 2. Foreign Key Dropdown Fallback
     f_table, f_pk = await resolve_fk_details(conn, table_name, column_name)
@@ -721,86 +934,213 @@ async def get_dropdown_options(conn, table_name, column_name):
 def _is_password_column(col_name: str) -> bool:
     if not col_name:
         return False
-    c = str(col_name).lower()
-    return c in ('pus_pwd', 'password', 'pus_password') or 'password' in c or c.endswith('pwd')
+    return _PASSWORD_COL_RE.search(str(col_name).lower()) is not None
 
-def _sanitize_payload(data, pk_column, schema_map, is_update=False):
-    clean_data = {}
-    for k, v in data.items():
-        if k == pk_column:
-            if is_update:
-                continue
-            if v == "" or v is None:
-                continue 
-        if 'created' in k.lower() or 'modified' in k.lower() or 'edited' in k.lower() or 'updated' in k.lower():
-            continue
+def _parse_iso_date(value: str) -> datetime:
+    """Parses a fixed-width YYYY-MM-DD string by slicing, avoiding strptime's per-call format handling."""
+    if len(value) != 10 or value[4] != '-' or value[7] != '-':
+        raise ValueError(f"Not a YYYY-MM-DD date: {value!r}")
+    return datetime(int(value[0:4]), int(value[5:7]), int(value[8:10]))
 
-        if is_update and (v == "" or v is None):
-            if _is_password_column(k):
-                continue
-            clean_data[k] = None
-            continue
-        elif not is_update and (v == "" or v is None):
-            continue
+def _coerce_int(v):
+    if isinstance(v, bool):
+        return v
+    try:
+        return int(v)
+    except (ValueError, TypeError):
+        # Decimal-formatted input such as "3.0"
+        try:
+            return int(float(v))
+        except (ValueError, TypeError, OverflowError):
+            return None
 
-        if _is_password_column(k) and v:
-            if isinstance(v, str) and not v.startswith(('$2b$', '$2a$')):
-                salt = bcrypt.gensalt()
-                v = bcrypt.hashpw(v.encode('utf-8'), salt).decode('utf-8')
+def _coerce_numeric(v):
+    # Decimal keeps exact numeric values (no float rounding) and accepts signs and exponents such as "-1.5e3"
+    if not isinstance(v, str):
+        return v
+    try:
+        return Decimal(v.strip())
+    except InvalidOperation:
+        return None
 
-        col_info = schema_map.get(k, {})
-        target_type = col_info.get('data_type', '').lower()
-        max_len = col_info.get('character_maximum_length')
-        
-        if 'date' in target_type or 'timestamp' in target_type or (isinstance(v, str) and len(v) == 10 and v[4] == '-' and v[7] == '-'):
-            if isinstance(v, str) and v:
+def _make_temporal_coercer(as_date):
+    def coerce(v):
+        if isinstance(v, str):
+            try:
+                parsed_dt = _parse_iso_date(v)
+            except ValueError:
                 try:
-                    parsed_dt = datetime.strptime(v, '%Y-%m-%d')
-                    v = parsed_dt.date() if target_type == 'date' else parsed_dt
+                    parsed_dt = datetime.fromisoformat(v)
                 except ValueError:
-                    try:
-                        parsed_dt = datetime.fromisoformat(v)
-                        v = parsed_dt.date() if target_type == 'date' else parsed_dt
-                    except ValueError:
-                        pass
-            elif isinstance(v, datetime) and target_type == 'date':
-                v = v.date()
-
-        if isinstance(v, str) and max_len is not None:
-            if len(v) > max_len:
-                if "status" in k and v.lower() == "active": v = "ACT"
-                elif "status" in k and v.lower() == "inactive": v = "INA"
-                else: v = v[:max_len]
-        
-        if target_type in ('integer', 'bigint', 'smallint'):
-            if isinstance(v, bool):
-                clean_data[k] = v
-            else:
-                try:
-                    clean_data[k] = int(float(v))
-                except (ValueError, TypeError, OverflowError):
-                    clean_data[k] = None
-        elif target_type == 'numeric' and isinstance(v, str):
-            try:
-                clean_data[k] = float(v) if '.' in v else int(v)
-            except (ValueError, TypeError):
-                clean_data[k] = None
+                    return v
+            return parsed_dt.date() if as_date else parsed_dt
+        if as_date and isinstance(v, datetime):
+            return v.date()
+        return v
+    return coerce
+
+def _make_text_coercer(col_name, max_len):
+    is_status = "status" in col_name
+    def coerce(v):
+        if isinstance(v, str) and len(v) > max_len:
+            if is_status and v.lower() == "active": return "ACT"
+            if is_status and v.lower() == "inactive": return "INA"
+            return v[:max_len]
+        return v
+    return coerce
+
+def _coerce_bytea(v):
+    return v.encode('utf-8') if isinstance(v, str) else v
+
+def _identity(v):
+    return v
+
+def get_column_coercers(table_name, schema_map):
+    """Builds (and caches) one value coercer per writable column from its data type.
+
+    Audit columns are left out, so payload keys without a coercer are dropped by _sanitize_payload.
+    """
+    if table_name in SCHEMA_CACHE["coercers"]:
+        return SCHEMA_CACHE["coercers"][table_name]
+    coercers = {}
+    for col_name, col_info in schema_map.items():
+        low = col_name.lower()
+        if 'created' in low or 'modified' in low or 'edited' in low or 'updated' in low:
+            continue
+        target_type = (col_info.get('data_type') or '').lower()
+        max_len = col_info.get('character_maximum_length')
+        if 'date' in target_type or 'timestamp' in target_type:
+            coerce = _make_temporal_coercer(target_type == 'date')
+        elif max_len is not None:
+            coerce = _make_text_coercer(col_name, max_len)
+        elif target_type in ('integer', 'bigint', 'smallint'):
+            coerce = _coerce_int
+        elif target_type == 'numeric':
+            coerce = _coerce_numeric
+        elif target_type == 'bytea':
+            coerce = _coerce_bytea
         else:
-            clean_data[k] = v
-
+            coerce = _identity
+        # Password fields arrive here already bcrypt-hashed off the event loop by process_api_action
+        coercers[col_name] = coerce
+    if coercers:
+        # An empty map means the table's columns are not known yet; cache only real results
+        SCHEMA_CACHE["coercers"][table_name] = coercers
+    return coercers
+
+def _sanitize_payload(data, pk_column, coercers, is_update=False):
+    clean_data = {}
+    for k, v in data.items():
+        coerce = coercers.get(k)
+        if coerce is None:
+            continue
+        if v == "" or v is None:
+            # Blank fields clear the column on update, except the key itself and stored password hashes
+            if is_update and k != pk_column and not _is_password_column(k):
+                clean_data[k] = None
+            continue
+        if is_update and k == pk_column:
+            continue
+        clean_data[k] = coerce(v)
     return clean_data
 
 
+def get_search_clause(table_name, columns_data, param_idx):
+    """Builds (and caches) the grid's OR-of-ILIKE search predicate so each table always sends the same SQL text."""
+    key = (table_name, param_idx)
+    if key not in SCHEMA_CACHE["search_sql"]:
+        search_clauses = [
+            f"CAST({quote_ident(c['column_name'])} AS TEXT) ILIKE ${param_idx}" for c in columns_data
+            if c['data_type'] not in ('bytea', 'json', 'jsonb', 'geometry', 'point', 'polygon')
+        ]
+        SCHEMA_CACHE["search_sql"][key] = "(" + " OR ".join(search_clauses) + ")" if search_clauses else ""
+    return SCHEMA_CACHE["search_sql"][key]
+
 @app.route('/')
 @check_auth
 async def dashboard(request):
     stats = {}
     return render_template('dashboard.html', request=request, stats=stats)
 
+def get_grid_layout(table_name, columns_data, pk_column):
+    """Classifies a table's columns once into grid display order.
+
+    Returns (columns, company_col): (raw, label) tuples for business columns, then date
+    columns, then audit "by" and audit date columns. The company column is returned
+    separately because its visibility depends on the viewer's role.
+    """
+    if table_name in SCHEMA_CACHE["layouts"]:
+        return SCHEMA_CACHE["layouts"][table_name]
+
+    columns = []
+    date_columns = []
+    audit_by_columns = []
+    audit_date_columns = []
+    company_col = None
+
+    for c in columns_data:
+        cname = c['column_name']
+        cname_low = cname.lower()
+        if cname in (pk_column, 'psn_screen_id'): continue
+
+        if 'company_id' in cname_low:
+            company_col = (cname, c['label'])
+            continue
+
+        # 1. Audit "By" columns (Created By / Modified By)
+        if 'created' in cname_low and 'by' in cname_low:
+            audit_by_columns.append((cname, "Created By"))
+            continue
+        elif ('modified' in cname_low or 'edited' in cname_low or 'updated' in cname_low) and 'by' in cname_low:
+            audit_by_columns.append((cname, "Modified By"))
+            continue
+
+        # 2. Audit "Date" columns (Created Date / Modified Date)
+        elif 'created' in cname_low and ('date' in c['data_type'] or 'timestamp' in c['data_type'] or 'date' in cname_low):
+            audit_date_columns.append((cname, "Created Date"))
+            continue
+        elif ('modified' in cname_low or 'edited' in cname_low or 'updated' in cname_low) and ('date' in c['data_type'] or 'timestamp' in c['data_type'] or 'date' in cname_low):
+            audit_date_columns.append((cname, "Modified Date"))
+            continue
+
+        col_def = (cname, c['label'])
+
+        # 3. Regular Date columns vs standard business columns
+        if 'date' in c['data_type'] or 'timestamp' in c['data_type']:
+            date_columns.append(col_def)
+        else:
+            columns.append(col_def)
+
+    columns.extend(date_columns)
+    columns.extend(audit_by_columns)
+    columns.extend(audit_date_columns)
+    layout = (columns, company_col)
+    SCHEMA_CACHE["layouts"][table_name] = layout
+    return layout
+
+def get_audit_columns(table_name, schema_map):
+    """Classifies a table's who/when audit columns once as (column, kind, max_len) tuples.
+
+    kind is one of 'modified_at', 'modified_by', 'created_at' or 'created_by'.
+    """
+    if table_name in SCHEMA_CACHE["audit_cols"]:
+        return SCHEMA_CACHE["audit_cols"][table_name]
+    audit_cols = []
+    for wc, info in schema_map.items():
+        wc_low = wc.lower()
+        is_modified = 'modified' in wc_low or 'edited' in wc_low or 'updated' in wc_low
+        if not (is_modified or 'created' in wc_low):
+            continue
+        kind = ('modified' if is_modified else 'created') + ('_by' if 'by' in wc_low else '_at')
+        audit_cols.append((wc, kind, info.get('character_maximum_length') or 50))
+    if schema_map:
+        # Tables whose columns are not known yet are classified again once they load
+        SCHEMA_CACHE["audit_cols"][table_name] = audit_cols
+    return audit_cols
+
 @app.route('/table/<table_name>')
 @check_auth
 async def show_table(request, table_name):
-    user_id = request.ctx.user_id
     role = request.ctx.role
     table_name = table_name.lower()
     
@@ -816,75 +1156,10 @@ async def show_table(request, table_name):
     search_query = request.args.get("q", "").strip()
     type_filter = request.args.get("type_filter", "").strip()
 
-    auth_tables = getattr(request.ctx, 'all_tables', None)
-    table_modules = getattr(request.ctx, 'table_modules', None)
-
-    async with app.ctx.pool.acquire() as conn:
-        if auth_tables is None or table_modules is None:
-            auth_tables, table_modules = await get_authorized_tables(conn, user_id, role)
-
-        if table_name not in auth_tables:
-            raise NotFound("Table not found or unauthorized")
-        
-        table_title = auth_tables[table_name]
-        pk_column = await get_pk_column(conn, table_name)
-        if not pk_column:
-            raise NotFound("Table configuration error: No Primary Key")
-
-        columns_data = await get_table_columns(conn, table_name)
-
-        if not columns_data:
-            raise NotFound("Table does not exist")
-
-        columns = []
-        date_columns = []
-        audit_by_columns = []
-        audit_date_columns = []
-        company_col_def = None
-
-        for c in columns_data:
-            cname = c['column_name']
-            cname_low = cname.lower()
-            if cname in (pk_column, 'psn_screen_id'): continue
-            
-            is_company_col = 'company_id' in cname_low
-            if is_company_col:
-                if role == 'ADM' and table_modules.get(table_name, '').lower() == 'erpadmin':
-                    clean_label = cname.split('_', 1)[-1].replace('_', ' ').title()
-                    company_col_def = {"raw": cname, "column_name": cname, "label": clean_label}
-                continue
-            
-            # 1. Audit "By" columns (Created By / Modified By)
-            if 'created' in cname_low and 'by' in cname_low:
-                audit_by_columns.append({"raw": cname, "column_name": cname, "label": "Created By"})
-                continue
-            elif ('modified' in cname_low or 'edited' in cname_low or 'updated' in cname_low) and 'by' in cname_low:
-                audit_by_columns.append({"raw": cname, "column_name": cname, "label": "Modified By"})
-                continue
-            
-            # 2. Audit "Date" columns (Created Date / Modified Date)
-            elif 'created' in cname_low and ('date' in c['data_type'] or 'timestamp' in c['data_type'] or 'date' in cname_low):
-                audit_date_columns.append({"raw": cname, "column_name": cname, "label": "Created Date"})
-                continue
-            elif ('modified' in cname_low or 'edited' in cname_low or 'updated' in cname_low) and ('date' in c['data_type'] or 'timestamp' in c['data_type'] or 'date' in cname_low):
-                audit_date_columns.append({"raw": cname, "column_name": cname, "label": "Modified Date"})
-                continue
-
-            clean_label = cname.split('_', 1)[-1].replace('_', ' ').title()
-            col_def = {"raw": cname, "column_name": cname, "label": clean_label}
-            
-            # 3. Regular Date columns vs standard business columns
-            if 'date' in c['data_type'] or 'timestamp' in c['data_type']:
-                date_columns.append(col_def)
-            else:
-                columns.append(col_def)
-                
-        columns.extend(date_columns)
-        columns.extend(audit_by_columns)
-        columns.extend(audit_date_columns)
-        if company_col_def:
-            columns.append(company_col_def)
+    table_title = require_authorized_table(request, table_name)
+    table_modules = request.ctx.table_modules
 
+    async with app.ctx.pool.acquire(timeout=DB_POOL_ACQUIRE_TIMEOUT) as conn:
         lookup_categories = []
         if table_name == 'phc_lookup_values_t':
             try:
@@ -899,85 +1174,72 @@ async def show_table(request, table_name):
                 except Exception:
                     lookup_categories = []
 
-        q_table = quote_ident(table_name)
-        q_pk = quote_ident(pk_column)
-        
-        base_query = f"SELECT * FROM {q_table}"
-        count_query = f"SELECT COUNT(*) FROM {q_table}"
-        params = []
-        where_clauses = []
-
-        if table_name == 'phc_lookup_values_t' and type_filter:
-            params.append(type_filter)
-            where_clauses.append(f"{quote_ident('plv_lookup_type_code')} = ${len(params)}")
-
-        if search_query:
-            params.append(f"%{search_query}%")
-            param_idx = len(params)
-            searchable_cols = [
-                c['column_name'] for c in columns_data 
-                if c['data_type'] not in ('bytea', 'json', 'jsonb', 'geometry', 'point', 'polygon')
-            ]
-            if searchable_cols:
-                search_clauses = [f"CAST({quote_ident(col)} AS TEXT) ILIKE ${param_idx}" for col in searchable_cols]
-                where_clauses.append("(" + " OR ".join(search_clauses) + ")")
-
-        if where_clauses:
-            where_str = " WHERE " + " AND ".join(where_clauses)
-            base_query += where_str
-            count_query += where_str
-
-        base_query += f" ORDER BY {q_pk} DESC LIMIT ${len(params)+1} OFFSET ${len(params)+2}"
-        
-        try:
-            total_count = await conn.fetchval(count_query, *params)
-            total_count = total_count or 0
-            raw_rows = await conn.fetch(base_query, *(params + [per_page, offset]))
-        except Exception:
-            clear_schema_cache()
-            total_count = await conn.fetchval(count_query, *params)
-            total_count = total_count or 0
-            raw_rows = await conn.fetch(base_query, *(params + [per_page, offset]))
+        # Column metadata may be stale after a schema change: on a query error, flush it, reload and rebuild once
+        for attempt in range(2):
+            pk_column = await get_pk_column(conn, table_name)
+            if not pk_column:
+                raise NotFound("Table configuration error: No Primary Key")
+
+            columns_data = await get_table_columns(conn, table_name)
+
+            if not columns_data:
+                raise NotFound("Table does not exist")
+
+            grid_columns, company_col = get_grid_layout(table_name, columns_data, pk_column)
+            columns = list(grid_columns)
+            if company_col and role == 'ADM' and table_modules.get(table_name, '').lower() == 'erpadmin':
+                columns.append(company_col)
+
+            q_table = quote_ident(table_name)
+            q_pk = quote_ident(pk_column)
+
+            # Fetch only what the grid renders (primary key + visible columns) rather than SELECT *
+            visible_cols = [raw for raw, _ in columns]
+            select_list = ", ".join(quote_ident(c) for c in [pk_column] + visible_cols)
+            base_query = f"SELECT {select_list} FROM {q_table}"
+            count_query = f"SELECT COUNT(*) FROM {q_table}"
+            params = []
+            where_clauses = []
+
+            if table_name == 'phc_lookup_values_t' and type_filter:
+                params.append(type_filter)
+                where_clauses.append(f"{quote_ident('plv_lookup_type_code')} = ${len(params)}")
+
+            if search_query:
+                params.append(f"%{search_query}%")
+                search_clause = get_search_clause(table_name, columns_data, len(params))
+                if search_clause:
+                    where_clauses.append(search_clause)
+
+            if where_clauses:
+                where_str = " WHERE " + " AND ".join(where_clauses)
+                base_query += where_str
+                count_query += where_str
+
+            base_query += f" ORDER BY {q_pk} DESC LIMIT ${len(params)+1} OFFSET ${len(params)+2}"
+
+            try:
+                total_count = await conn.fetchval(count_query, *params)
+                total_count = total_count or 0
+                raw_rows = await conn.fetch(base_query, *(params + [per_page, offset]))
+                break
+            except asyncpg.PostgresError:
+                if attempt:
+                    raise
+                clear_schema_cache()
 
         resolved_rows = [dict(r) for r in raw_rows]
         
         # Batch fetch all active lookup types in a SINGLE fast query to eliminate N+1 latency
-        lookup_map = {}
-        try:
-            l_rows = await conn.fetch("""
-                SELECT upper(plv_lookup_code) as type_code, plv_lookup_value_code as id, plv_lookup_value_name as name 
-                FROM phc_lookup_values_t 
-                WHERE plv_status = 'ACT'
-                  AND CURRENT_DATE BETWEEN COALESCE(plv_start_date, CURRENT_DATE) AND COALESCE(plv_end_date, CURRENT_DATE + interval '1 day')
-            """)
-            for lr in l_rows:
-                tc = lr['type_code']
-                if tc not in lookup_map:
-                    lookup_map[tc] = {}
-                lookup_map[tc][str(lr['id'])] = str(lr['name'])
-        except Exception:
-            try:
-                l_rows = await conn.fetch("""
-                    SELECT upper(plv_lookup_type_code) as type_code, plv_lookup_value_code as id, plv_lookup_value_name as name 
-                    FROM phc_lookup_values_t 
-                    WHERE plv_status = 'ACT'
-                      AND CURRENT_DATE BETWEEN COALESCE(plv_start_date, CURRENT_DATE) AND COALESCE(plv_end_date, CURRENT_DATE + interval '1 day')
-                """)
-                for lr in l_rows:
-                    tc = lr['type_code']
-                    if tc not in lookup_map:
-                        lookup_map[tc] = {}
-                    lookup_map[tc][str(lr['id'])] = str(lr['name'])
-            except Exception:
-                lookup_map = {}
+        lookup_map = {
+            tc: {str(lid): str(name) for _, lid, name in l_rows}
+            for tc, l_rows in (await fetch_active_lookups(conn)).items()
+        }
 
         # Resolve FKs and lookups
         fk_map = await get_fk_map(conn, table_name)
         
-        for c in columns_data:
-            cname = c['column_name']
-            if cname == pk_column: continue
-            
+        for cname in visible_cols:
             # 1. Foreign Key Resolution
             f_table, f_pk = await resolve_fk_details(conn, table_name, cname)
             if f_table and f_pk:
@@ -1042,21 +1304,12 @@ async def show_form_view_alias(request, table_name, pk_val):
     return await render_form(request, table_name, is_update=True, pk_val=pk_val)
 
 async def render_form(request, table_name, is_update=False, pk_val=None):
-    user_id = request.ctx.user_id
     role = request.ctx.role
     table_name = table_name.lower()
 
-    auth_tables = getattr(request.ctx, 'all_tables', None)
-    table_modules = getattr(request.ctx, 'table_modules', None)
+    table_title = require_authorized_table(request, table_name)
 
-    async with app.ctx.pool.acquire() as conn:
-        if auth_tables is None or table_modules is None:
-            auth_tables, table_modules = await get_authorized_tables(conn, user_id, role)
-
-        if table_name not in auth_tables:
-            raise NotFound("Table not found or unauthorized")
-        
-        table_title = auth_tables[table_name]
+    async with app.ctx.pool.acquire(timeout=DB_POOL_ACQUIRE_TIMEOUT) as conn:
         pk_column = await get_pk_column(conn, table_name)
         columns_data = await get_table_columns(conn, table_name)
         schema_map = SCHEMA_CACHE["schema_maps"].get(table_name, {c['column_name']: c for c in columns_data})
@@ -1075,6 +1328,9 @@ async def render_form(request, table_name, is_update=False, pk_val=None):
             if not row_data:
                 raise NotFound(f"Record not found. Table: {q_table}, PK: {q_pk}, Value: '{cast_pk}', Type: {type(cast_pk).__name__}")
 
+        # One lookup query per form instead of one (or two) per column
+        lookups = await fetch_active_lookups(conn)
+
         columns = []
         company_form_def = None
         for c in columns_data:
@@ -1086,20 +1342,17 @@ async def render_form(request, table_name, is_update=False, pk_val=None):
             if is_company_col:
                 if not (table_name == 'phc_screens_t' and role == 'ADM'):
                     continue
-            
-            clean_label = cname.split('_', 1)[-1].replace('_', ' ').title()
-            
             val = row_data.get(cname, '') if is_update else ''
-            options = await get_dropdown_options(conn, table_name, cname)
+            options = await get_dropdown_options(conn, table_name, cname, lookups)
 
             json_options = None
             if table_name == 'phc_role_screen_assignment_t' and cname == 'prs_screen_id' and not is_update:
-                json_options = await get_dropdown_options(conn, table_name, cname)
-                options = [] 
+                json_options = options
+                options = []
                 
             col_def = {
                 "column_name": cname,
-                "label": clean_label,
+                "label": c['label'],
                 "data_type": c['data_type'],
                 "required": c['is_nullable'] == 'NO' and 'default' not in cname.lower(),
                 "is_pk": cname == pk_column,
@@ -1140,20 +1393,45 @@ async def render_form(request, table_name, is_update=False, pk_val=None):
         audit_info=audit_info
     )
 
+CSV_EXPORT_PREFETCH = 1000
+CSV_EXPORT_CHUNK_SIZE = 64 * 1024
+# One budget for the whole COPY; the pool's per-statement DB_COMMAND_TIMEOUT would cut large exports short
+CSV_EXPORT_TIMEOUT = 600
+# Column types whose COPY CSV text (after _csv_export_expr) matches the Python row writer's str() output.
+# Tables with any other type (numeric, float, arrays, bytea, json, interval, time, ...) use the cursor path.
+COPY_EXPORT_TYPES = frozenset({
+    'character varying', 'character', 'text', 'integer', 'bigint', 'smallint', 'uuid', 'boolean', 'date',
+    'timestamp without time zone', 'timestamp with time zone'
+})
+
+def _csv_export_expr(c):
+    """SQL for one exported column, formatted server-side the way the Python row writer renders it."""
+    q_col = quote_ident(c['column_name'])
+    data_type = c['data_type']
+    if data_type == 'timestamp with time zone':
+        return f"to_char({q_col} AT TIME ZONE 'UTC', 'YYYY-MM-DD')"
+    if data_type.startswith('timestamp') or data_type == 'date':
+        return f"to_char({q_col}, 'YYYY-MM-DD')"
+    if data_type == 'boolean':
+        return f"CASE WHEN {q_col} THEN 'True' WHEN NOT {q_col} THEN 'False' END"
+    if data_type in ('character varying', 'character', 'text'):
+        # COPY quotes empty strings to tell them from NULL; the row writer leaves both unquoted
+        return f"NULLIF({q_col}, '')"
+    return q_col
+
 @app.route('/export/<table_name>')
 @check_auth
 async def export_table_csv(request, table_name):
     import csv
     import io
     
-    user_id = request.ctx.user_id
     role = request.ctx.role
     table_name = table_name.lower()
 
-    async with app.ctx.pool.acquire() as conn:
-        auth_tables, table_modules = await get_authorized_tables(conn, user_id, role)
-        if table_name not in auth_tables:
-            raise NotFound("Table not found or unauthorized")
+    table_title = require_authorized_table(request, table_name)
+    table_modules = request.ctx.table_modules
+
+    async with app.ctx.pool.acquire(timeout=DB_POOL_ACQUIRE_TIMEOUT) as conn:
 
         pk_column = await get_pk_column(conn, table_name)
         columns_data = await get_table_columns(conn, table_name)
@@ -1167,47 +1445,90 @@ async def export_table_csv(request, table_name):
             is_company_col = 'company_id' in cname.lower()
             if is_company_col:
                 if role == 'ADM' and table_modules.get(table_name, '').lower() == 'erpadmin':
-                    company_csv_col = cname
+                    company_csv_col = c
                 continue
-            export_cols.append(cname)
+            export_cols.append(c)
         if company_csv_col:
             export_cols.append(company_csv_col)
 
         if not export_cols:
             return response.text("No exportable columns found.", status=400)
 
-        col_list = ", ".join(quote_ident(c) for c in export_cols)
         q_table = quote_ident(table_name)
         order_clause = f" ORDER BY {quote_ident(pk_column)} DESC" if pk_column else ""
-        rows = await conn.fetch(f"SELECT {col_list} FROM {q_table}{order_clause}")
-
-    output = io.StringIO()
-    writer = csv.writer(output)
-
-    header = [col.split('_', 1)[-1].replace('_', ' ').title() for col in export_cols]
-    writer.writerow(header)
-
-    for row in rows:
-        csv_row = []
-        for col in export_cols:
-            val = row[col]
-            if val is None:
-                csv_row.append('')
-            elif isinstance(val, datetime):
-                csv_row.append(val.strftime('%Y-%m-%d'))
-            else:
-                csv_row.append(str(val))
-        writer.writerow(csv_row)
-
-    csv_content = output.getvalue()
-    output.close()
-
-    table_title = auth_tables.get(table_name, table_name)
-    filename = f"{table_title.replace(' ', '_')}_Export.csv"
-
-    res = response.text(csv_content, content_type="text/csv")
-    res.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
-    return add_security_headers(res)
+        use_copy = all(c['data_type'] in COPY_EXPORT_TYPES for c in export_cols)
+
+        filename = f"{table_title.replace(' ', '_')}_Export.csv"
+        res = add_security_headers(response.HTTPResponse(content_type="text/csv"))
+        res.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+        res = await request.respond(res)
+
+        # The writer encodes straight into a bytes buffer, which is flushed to the socket in ~64 KB chunks.
+        # COPY emits LF line endings, so its exports use LF throughout; the cursor path keeps csv's CRLF.
+        output = io.BytesIO()
+        writer = csv.writer(
+            io.TextIOWrapper(output, encoding="utf-8", newline="", write_through=True),
+            lineterminator="\n" if use_copy else "\r\n"
+        )
+        writer.writerow([c['label'] for c in export_cols])
+
+        async def flush_if_full():
+            if output.tell() >= CSV_EXPORT_CHUNK_SIZE:
+                await res.send(output.getvalue())
+                output.seek(0)
+                output.truncate()
+
+        if use_copy:
+            # Postgres renders the CSV itself (COPY ... TO STDOUT) and asyncpg hands over raw bytes:
+            # no per-row decoding into Python objects and re-encoding
+            async def sink(chunk):
+                output.write(chunk)
+                await flush_if_full()
+
+            col_list = ", ".join(_csv_export_expr(c) for c in export_cols)
+            await conn.copy_from_query(
+                f"SELECT {col_list} FROM {q_table}{order_clause}",
+                output=sink, format='csv', timeout=CSV_EXPORT_TIMEOUT
+            )
+        else:
+            # Stream rows from a server-side cursor: constant memory, first bytes after the first fetch
+            col_list = ", ".join(quote_ident(c['column_name']) for c in export_cols)
+            async with conn.transaction():
+                async for row in conn.cursor(f"SELECT {col_list} FROM {q_table}{order_clause}", prefetch=CSV_EXPORT_PREFETCH):
+                    csv_row = []
+                    for val in row:
+                        if val is None:
+                            csv_row.append('')
+                        elif isinstance(val, datetime):
+                            csv_row.append(val.strftime('%Y-%m-%d'))
+                        else:
+                            csv_row.append(str(val))
+                    writer.writerow(csv_row)
+                    await flush_if_full()
+
+        await res.send(output.getvalue())
+        await res.eof()
+
+@lru_cache(maxsize=1024)
+def build_insert_sql(table_name, cols, max_pk=None, returning=None):
+    """Builds an INSERT for a column tuple; max_pk adds that key as MAX + 1 computed in the statement itself."""
+    q_cols = [quote_ident(c) for c in cols]
+    values = [f"${i+1}" for i in range(len(cols))]
+    q_table = quote_ident(table_name)
+    if max_pk:
+        q_pk = quote_ident(max_pk)
+        q_cols.insert(0, q_pk)
+        values.insert(0, f"(SELECT COALESCE(MAX({q_pk}), 0) + 1 FROM {q_table})")
+    q = f"INSERT INTO {q_table} ({', '.join(q_cols)}) VALUES ({', '.join(values)})"
+    if returning:
+        q += f" RETURNING {quote_ident(returning)}"
+    return q
+
+@lru_cache(maxsize=1024)
+def build_update_sql(table_name, cols, pk_column):
+    """Builds an UPDATE for a column tuple; the primary key is bound after the column values."""
+    set_clause = ", ".join(f"{quote_ident(c)} = ${i+1}" for i, c in enumerate(cols))
+    return f"UPDATE {quote_ident(table_name)} SET {set_clause} WHERE {quote_ident(pk_column)} = ${len(cols)+1}"
 
 @app.route('/api/<table_name>', methods=['POST'], name="api_create")
 @check_auth
@@ -1230,13 +1551,24 @@ async def process_api_action(request, table_name, pk_val):
     elif pk_val is not None and method != 'DELETE':
         method = 'PUT'
 
-    async with app.ctx.pool.acquire() as conn:
-        auth_tables, _ = await get_authorized_tables(conn, user_id, role)
-        if table_name not in auth_tables:
-            return response.json({"error": "Unauthorized"}, status=403)
-        
+    # Validate authorization and payload before taking a pool slot
+    if table_name not in request.ctx.all_tables:
+        return response.json({"error": "Unauthorized"}, status=403)
+
+    if method != 'DELETE':
+        try:
+            data = request.form if request.form else request.json
+            if not data:
+                return add_security_headers(response.json({"error": "No data provided"}, status=400))
+            data_dict = {k: v[0] if isinstance(v, list) else v for k, v in data.items() if k != '_method'}
+        except Exception:
+            return add_security_headers(response.json({"error": "Invalid or malformed payload"}, status=400))
+
+    async with app.ctx.pool.acquire(timeout=DB_POOL_ACQUIRE_TIMEOUT) as conn:
         pk_column = await get_pk_column(conn, table_name)
         columns_info = await get_table_columns(conn, table_name)
+        if not columns_info:
+            return add_security_headers(response.json({"error": "Table does not exist"}, status=404))
         schema_map = SCHEMA_CACHE["schema_maps"].get(table_name, {c['column_name']: c for c in columns_info})
         pk_type = schema_map.get(pk_column, {}).get('data_type', 'integer')
 
@@ -1249,23 +1581,14 @@ async def process_api_action(request, table_name, pk_val):
 
         if method == 'DELETE':
             try:
-                async with conn.transaction():
-                    res = await conn.execute(f"DELETE FROM {q_table} WHERE {q_pk} = $1", cast_pk)
+                res = await conn.execute(f"DELETE FROM {q_table} WHERE {q_pk} = $1", cast_pk)
                 if res.endswith(" 0"):
                     return add_security_headers(response.json({"error": "Record not found"}, status=404))
-                clear_schema_cache()
+                clear_auth_cache()
                 return add_security_headers(response.json({"status": "success"}))
             except Exception as e:
                 return add_security_headers(response.json({"error": str(e)}, status=400))
 
-        try:
-            data = request.form if request.form else request.json
-            if not data:
-                return add_security_headers(response.json({"error": "No data provided"}, status=400))
-            data_dict = {k: v[0] if isinstance(v, list) else v for k, v in data.items() if k != '_method'}
-        except Exception:
-            return add_security_headers(response.json({"error": "Invalid or malformed payload"}, status=400))
-
         if request.files:
             upload_dir = os.path.join(os.getcwd(), 'uploads')
             os.makedirs(upload_dir, exist_ok=True)
@@ -1301,7 +1624,7 @@ async def process_api_action(request, table_name, pk_val):
                 if len(pwd_val) < 6:
                     return add_security_headers(response.json({"error": "Password must be at least 6 characters long."}, status=400))
                 
-                data_dict['pus_pwd'] = bcrypt.hashpw(pwd_val.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+                data_dict['pus_pwd'] = await hash_password(pwd_val)
                 data_dict[user_col] = username_val
             
             elif method == 'PUT':
@@ -1321,11 +1644,16 @@ async def process_api_action(request, table_name, pk_val):
                         return add_security_headers(response.json({"error": "Password must contain at least one uppercase letter (A-Z)."}, status=400))
                     if len(pwd_val) < 6:
                         return add_security_headers(response.json({"error": "Password must be at least 6 characters long."}, status=400))
-                    data_dict['pus_pwd'] = bcrypt.hashpw(pwd_val.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+                    data_dict['pus_pwd'] = await hash_password(pwd_val)
                 else:
                     data_dict.pop('pus_pwd', None)
 
-        clean_data = _sanitize_payload(data_dict, pk_column, schema_map, is_update=(method == 'PUT'))
+        # Hash any remaining plain-text password fields off the event loop; _sanitize_payload skips bcrypt hashes
+        for k, v in data_dict.items():
+            if _is_password_column(k) and isinstance(v, str) and v and not v.startswith(('$2b$', '$2a$')):
+                data_dict[k] = await hash_password(v)
+
+        clean_data = _sanitize_payload(data_dict, pk_column, get_column_coercers(table_name, schema_map), is_update=(method == 'PUT'))
 
         # 2. Enforce Multi-tenant Company Segregation
         if table_name != 'phc_companies_t':
@@ -1337,30 +1665,29 @@ async def process_api_action(request, table_name, pk_val):
                         clean_data[company_col] = user_company
 
         # 3. Mandatory Session Username and Audit Trail Binding
-        session_username = getattr(request.ctx, 'username', None) or 'System'
-        who_cols = [c for c in schema_map if 'created' in c.lower() or 'modified' in c.lower() or 'edited' in c.lower() or 'updated' in c.lower()]
-        for wc in who_cols:
-            max_len = schema_map.get(wc, {}).get('character_maximum_length') or 50
-            user_str = str(session_username)[:max_len]
-            
-            if ('modified' in wc.lower() or 'edited' in wc.lower() or 'updated' in wc.lower()) and 'by' not in wc.lower():
-                clean_data[wc] = datetime.now()
-            elif ('modified' in wc.lower() or 'edited' in wc.lower() or 'updated' in wc.lower()) and 'by' in wc.lower():
-                clean_data[wc] = user_str
-            elif method == 'POST':
-                if 'created' in wc.lower() and 'by' not in wc.lower():
-                    clean_data[wc] = datetime.now()
-                elif 'created' in wc.lower() and 'by' in wc.lower():
-                    clean_data[wc] = user_str
+        session_username = str(getattr(request.ctx, 'username', None) or 'System')
+        now = datetime.now()
+        for wc, kind, max_len in get_audit_columns(table_name, schema_map):
+            if kind.startswith('created') and method != 'POST':
+                continue
+            clean_data[wc] = now if kind.endswith('_at') else session_username[:max_len]
+
+        # Integer primary keys not supplied by the form come from a sequence default
+        pk_from_sequence = False
+        new_id = cast_pk
+        if method == 'POST' and pk_column and pk_type in ('integer', 'bigint', 'smallint'):
+            if clean_data.get(pk_column) is None or clean_data.get(pk_column) == "":
+                clean_data.pop(pk_column, None)
+                pk_from_sequence = await has_pk_sequence(conn, table_name, pk_column)
 
         try:
             async with conn.transaction():
                 if method == 'POST':
-                    # Auto-generate integer/serial primary key if not supplied by form
-                    if pk_column and (pk_column not in clean_data or clean_data[pk_column] is None or clean_data[pk_column] == ""):
-                        if pk_type in ('integer', 'bigint', 'smallint'):
-                            max_val = await conn.fetchval(f"SELECT MAX({q_pk}) FROM {q_table}")
-                            clean_data[pk_column] = (max_val or 0) + 1
+                    # Legacy fallback when no sequence default could be attached: the key is
+                    # computed inside the INSERT itself instead of a separate MAX() round-trip
+                    max_pk = None
+                    if pk_column and pk_type in ('integer', 'bigint', 'smallint') and not pk_from_sequence and pk_column not in clean_data:
+                        max_pk = pk_column
                     if table_name == 'phc_role_screen_assignment_t' and 'prs_screen_id' in data_dict:
                         raw_scr = data_dict['prs_screen_id']
                         scr_list = []
@@ -1375,37 +1702,38 @@ async def process_api_action(request, table_name, pk_val):
                         else:
                             scr_list = [raw_scr]
 
+                        # One prepared INSERT executed for every screen in a single batch
+                        col_names = tuple(sorted(clean_data.keys() | {'prs_screen_id'}))
+                        records = []
                         for sid in scr_list:
                             row_clean = clean_data.copy()
                             row_clean['prs_screen_id'] = int(sid)
-                            cols = [quote_ident(c) for c in row_clean.keys()]
-                            vals = list(row_clean.values())
-                            placeholders = ", ".join([f"${i+1}" for i in range(len(vals))])
-                            q = f"INSERT INTO {q_table} ({', '.join(cols)}) VALUES ({placeholders})"
-                            await conn.execute(q, *vals)
+                            records.append([row_clean[c] for c in col_names])
+                        if records:
+                            await conn.executemany(build_insert_sql(table_name, col_names, max_pk), records)
                     else:
-                        cols = [quote_ident(c) for c in clean_data.keys()]
-                        vals = list(clean_data.values())
-                        placeholders = ", ".join([f"${i+1}" for i in range(len(vals))])
-                        q = f"INSERT INTO {q_table} ({', '.join(cols)}) VALUES ({placeholders})"
-                        await conn.execute(q, *vals)
+                        cols = tuple(sorted(clean_data))
+                        vals = [clean_data[c] for c in cols]
+                        if pk_column:
+                            new_id = await conn.fetchval(build_insert_sql(table_name, cols, max_pk, pk_column), *vals)
+                        else:
+                            await conn.execute(build_insert_sql(table_name, cols), *vals)
 
                 elif method == 'PUT':
                     if not clean_data:
                         return add_security_headers(response.json({"error": "No update fields provided"}, status=400))
-                    cols = list(clean_data.keys())
-                    vals = list(clean_data.values())
-                    set_clause = ", ".join([f"{quote_ident(c)} = ${i+1}" for i, c in enumerate(cols)])
-                    q = f"UPDATE {q_table} SET {set_clause} WHERE {q_pk} = ${len(vals)+1}"
-                    res = await conn.execute(q, *(vals + [cast_pk]))
+                    cols = tuple(sorted(clean_data))
+                    vals = [clean_data[c] for c in cols]
+                    res = await conn.execute(build_update_sql(table_name, cols, pk_column), *vals, cast_pk)
                     if res.endswith(" 0"):
                         return add_security_headers(response.json({"error": "Record not found"}, status=404))
 
-            # Immediately flush auth and schema caches so changes to screens, modules, or lookups take effect instantly
-            clear_schema_cache()
+            # Immediately flush auth caches so changes to screens, modules, or roles take effect instantly.
+            # Row writes never alter information_schema, so the schema cache is kept warm.
+            clear_auth_cache()
 
             if request.headers.get("HX-Request"):
-                res = response.json({"status": "success"})
+                res = response.json({"status": "success", "id": None if new_id is None else str(new_id)})
                 res.headers["HX-Redirect"] = f"/table/{table_name}"
                 return add_security_headers(res)
             else:
@@ -1569,43 +1897,61 @@ async def fixdb_route(request):
     }
 
     try:
-        async with app.ctx.pool.acquire() as conn:
+        async with app.ctx.pool.acquire(timeout=DB_POOL_ACQUIRE_TIMEOUT) as conn:
+            # Keys come from the sequence default attached at startup when there is one, else MAX + 1 inside the INSERT
+            module_id = "DEFAULT" if await has_pk_sequence(conn, 'phc_module_t', 'pmd_module_id') else "(SELECT COALESCE(MAX(pmd_module_id), 0) + 1 FROM phc_module_t)"
+            screen_id = "DEFAULT" if await has_pk_sequence(conn, 'phc_screens_t', 'psn_screen_id') else "(SELECT COALESCE(MAX(psn_screen_id), 0) + 1 FROM phc_screens_t)"
             async with conn.transaction():
                 # 1. Nuke the ghost testing screens
                 await conn.execute("DELETE FROM phc_screens_t WHERE psn_screen_name = 'Updated Screen'")
                 
-                # 2. Get/Create all Modules from Excel
-                unique_modules = set(EXCEL_MAPPINGS.values())
-                for mod_name in unique_modules:
-                    exists = await conn.fetchval("SELECT pmd_module_id FROM phc_module_t WHERE pmd_module_name = $1", mod_name)
-                    if not exists:
-                        max_id = await conn.fetchval("SELECT MAX(pmd_module_id) FROM phc_module_t")
-                        await conn.execute("INSERT INTO phc_module_t (pmd_module_id, pmd_module_name, pmd_status, pmd_created_by, pmd_modified_by) VALUES ($1, $2, 'ACT', 'System', 'System')", (max_id or 0) + 1, mod_name)
-                        
-                # 3. Fetch module mapping dictionary
-                mod_rows = await conn.fetch("SELECT pmd_module_id, pmd_module_name FROM phc_module_t")
-                mod_dict = {row['pmd_module_name']: row['pmd_module_id'] for row in mod_rows}
-
-                # 4. Map screens to exact modules
+                # 2. Get/Create all Modules from Excel, collecting their ids as we go
+                mod_dict = {}
+                for mod_name in set(EXCEL_MAPPINGS.values()):
+                    mod_id = await conn.fetchval("SELECT pmd_module_id FROM phc_module_t WHERE pmd_module_name = $1", mod_name)
+                    if not mod_id:
+                        mod_id = await conn.fetchval(f"INSERT INTO phc_module_t (pmd_module_id, pmd_module_name, pmd_status, pmd_created_by, pmd_modified_by) VALUES ({module_id}, $1, 'ACT', 'System', 'System') RETURNING pmd_module_id", mod_name)
+                    mod_dict[mod_name] = mod_id
+
+                # 3. Map screens to exact modules
                 for screen_code, module_name in EXCEL_MAPPINGS.items():
                     target_mod_id = mod_dict.get(module_name)
                     if target_mod_id:
                         await conn.execute("UPDATE phc_screens_t SET psn_module_id = $1 WHERE psn_screen_code = $2", target_mod_id, screen_code)
 
-                # 5. Insert Manage Modules and Manage Screens if they don't exist yet
+                # 4. Insert Manage Modules and Manage Screens if they don't exist yet
                 for screen_code, screen_name in [('phc_module_t', 'Manage Modules'), ('phc_screens_t', 'Manage Screens')]:
                     exists = await conn.fetchval("SELECT psn_screen_id FROM phc_screens_t WHERE psn_screen_code = $1", screen_code)
                     if not exists:
-                        max_scr = await conn.fetchval("SELECT MAX(psn_screen_id) FROM phc_screens_t")
-                        await conn.execute("""
+                        await conn.execute(f"""
                             INSERT INTO phc_screens_t (psn_screen_id, psn_company_id, psn_module_id, psn_screen_code, psn_screen_name, psn_status, psn_created_by, psn_modified_by) 
-                            VALUES ($1, 1, $2, $3, $4, 'ACT', 'System', 'System')
-                        """, (max_scr or 0) + 1, mod_dict['ERPAdmin'], screen_code, screen_name)
+                            VALUES ({screen_id}, 1, $1, $2, $3, 'ACT', 'System', 'System')
+                        """, mod_dict['ERPAdmin'], screen_code, screen_name)
 
-        clear_schema_cache()
+        clear_auth_cache()
         return response.html("<h1>Database Fix Applied!</h1><p>Every screen has been perfectly mapped to the Excel spreadsheet layout. Go back to the <a href='/'>dashboard</a> and hit refresh.</p>")
     except Exception as e:
         return response.html(f"<h1>Error</h1><p>{e}</p>")
 
+@app.route('/admin/refresh-schema', methods=['POST'])
+@check_auth
+async def refresh_schema_route(request):
+    """Drops cached table metadata so DDL changes are picked up without a restart."""
+    if getattr(request.ctx, 'role', 'STD') != 'ADM':
+        return add_security_headers(response.json({"error": "Forbidden: Admin access required"}, status=403))
+    clear_schema_cache()
+    try:
+        async with app.ctx.pool.acquire(timeout=DB_POOL_ACQUIRE_TIMEOUT) as conn:
+            await warm_schema_cache(conn)
+    except Exception as e:
+        print("Schema cache warm-up skipped:", e)
+    return add_security_headers(response.json({"status": "success", "message": "Schema cache refreshed"}))
+
 if __name__ == '__main__':
-    app.run(host="0.0.0.0", port=PORT, single_process=True)
\ No newline at end of file
+    app.run(
+        host="0.0.0.0",
+        port=PORT,
+        debug=DEBUG,
+        access_log=DEBUG,
+        workers=1 if DEBUG else WORKERS
+    )
\ No newline at end of file